@@ -28,6 +28,10 @@ def _parseargs() -> Namespace:  # {{{
                       action='store_true',
                       default=False,
                       help='Enable FUSE debugging output')
+  parser.add_argument('--workers',
+                      type=int,
+                      default=None,
+                      help='Number of request workers (default: CPU count)')
   return parser.parse_args()
 
 
@@ -60,8 +64,8 @@ def main() -> None:  # {{{
   # llfuse.close()
   run_tar_fs(options.tarfile,
              mpath,
-             options.fuse_options,
-             debug=options.debug_fuse)
+             debug=options.debug_fuse,
+             workers=options.workers)
 
 
 # }}}
@@ -37,11 +37,15 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     install_requires=['llfuse>=1.3.0'],
+    extras_require={
+        'seekable': ['indexed_gzip', 'indexed_bzip2'],
+    },
     tests_requires=[
         'pytest',
         'pytest-cov',
         'pytest-ordering',
         'pytest-pylint',
+        'pytest-xdist',
     ],
     entry_points={
         'console_scripts': ['fuse_tar=fuse_tar.__main__:main'],
@@ -1,3 +1,9 @@
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+
 import pytest
 import time
 import gc
@@ -5,6 +11,54 @@ import gc
 # Enable output checks
 pytest_plugins = ('pytest_checklogs')
 
+# member layout of the generated test archives: (name, content), where
+# content is bytes for a regular file, a target string for a symlink
+# and None for a directory
+ARCHIVE_MEMBERS = [
+    ('dir1', None),
+    ('dir1/file1.txt', b'I am file1'),
+    ('dir1/file2.txt', b'I am file2'),
+    ('tmp-symlink', '/tmp'),
+    ('513.txt', b'123' * 171 + b'\n'),
+    ('10241.txt', b'1234567' * 1463 + b'\n'),
+]
+
+# fixed mtime so the archives are bit-for-bit reproducible
+_ARCHIVE_MTIME = 1619711279
+
+
+@pytest.fixture(scope='session')
+def archives(tmp_path_factory):
+  """Generate tarfile1.tar{,.gz,.bz2,.xz} once per session and return
+  the directory holding them; nothing binary needs to be checked in and
+  the compressed variants are built from the plain tar in one pass"""
+
+  out_dir = tmp_path_factory.mktemp('archives')
+  plain = out_dir / 'tarfile1.tar'
+  with tarfile.open(str(plain), 'w') as tar:
+    for (name, content) in ARCHIVE_MEMBERS:
+      info = tarfile.TarInfo(name)
+      info.mtime = _ARCHIVE_MTIME
+      if content is None:
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o775
+        tar.addfile(info)
+      elif isinstance(content, str):
+        info.type = tarfile.SYMTYPE
+        info.linkname = content
+        info.mode = 0o777
+        tar.addfile(info)
+      else:
+        info.size = len(content)
+        info.mode = 0o664
+        tar.addfile(info, io.BytesIO(content))
+
+  raw = plain.read_bytes()
+  (out_dir / 'tarfile1.tar.gz').write_bytes(gzip.compress(raw))
+  (out_dir / 'tarfile1.tar.bz2').write_bytes(bz2.compress(raw))
+  (out_dir / 'tarfile1.tar.xz').write_bytes(lzma.compress(raw))
+  return str(out_dir)
+
 
 # Register false positives
 @pytest.fixture(autouse=True)
@@ -1,9 +1,11 @@
 """Test the fuse bits"""
 
+import gc
+import hashlib
 import logging
+import mmap
 import multiprocessing
 import os
-import pathlib
 import stat
 import sys
 import threading
@@ -17,174 +19,140 @@ from util import cleanup, fuse_test_marker, sha1sum, umount, wait_for_mount
 
 pytestmark = fuse_test_marker()
 
-items = [
-    ('tarfile1.tar', '513.txt', 514,
-     'dde18dafb16622dee24c63e54531c65d8675afef'),
-    ('tarfile1.tar', '10241.txt', 10242,
-     '9340f4c0e495862b8d9a62a44e604896a047713a'),
-    ('tarfile1.tar', 'dir1/file1.txt', 10,
-     '8dfd2dbf199f4a18c121532c261de6e7dbc5bd31'),
-    ('tarfile1.tar', 'dir1/file2.txt', 10,
-     '2ae5b479319444ab14e493acd1c60c46e10a564e'),
-    ('tarfile1.tar.gz', '513.txt', 514,
-     'dde18dafb16622dee24c63e54531c65d8675afef'),
-    ('tarfile1.tar.gz', '10241.txt', 10242,
-     '9340f4c0e495862b8d9a62a44e604896a047713a'),
-    ('tarfile1.tar.gz', 'dir1/file1.txt', 10,
-     '8dfd2dbf199f4a18c121532c261de6e7dbc5bd31'),
-    ('tarfile1.tar.gz', 'dir1/file2.txt', 10,
-     '2ae5b479319444ab14e493acd1c60c46e10a564e'),
-    ('tarfile1.tar.bz2', '513.txt', 514,
-     'dde18dafb16622dee24c63e54531c65d8675afef'),
-    ('tarfile1.tar.bz2', '10241.txt', 10242,
-     '9340f4c0e495862b8d9a62a44e604896a047713a'),
-    ('tarfile1.tar.bz2', 'dir1/file1.txt', 10,
-     '8dfd2dbf199f4a18c121532c261de6e7dbc5bd31'),
-    ('tarfile1.tar.bz2', 'dir1/file2.txt', 10,
-     '2ae5b479319444ab14e493acd1c60c46e10a564e'),
-    ('tarfile1.tar.xz', '513.txt', 514,
-     'dde18dafb16622dee24c63e54531c65d8675afef'),
-    ('tarfile1.tar.xz', '10241.txt', 10242,
-     '9340f4c0e495862b8d9a62a44e604896a047713a'),
-    ('tarfile1.tar.xz', 'dir1/file1.txt', 10,
-     '8dfd2dbf199f4a18c121532c261de6e7dbc5bd31'),
-    ('tarfile1.tar.xz', 'dir1/file2.txt', 10,
-     '2ae5b479319444ab14e493acd1c60c46e10a564e'),
+# every compression variant of the same archive ...
+FORMATS = (
+    'tarfile1.tar',
+    'tarfile1.tar.gz',
+    'tarfile1.tar.bz2',
+    'tarfile1.tar.xz',
+)
+
+# ... holds the same members: (member_filename, size, sha1)
+MEMBERS = [
+    ('513.txt', 514, 'dde18dafb16622dee24c63e54531c65d8675afef'),
+    ('10241.txt', 10242, '9340f4c0e495862b8d9a62a44e604896a047713a'),
+    ('dir1/file1.txt', 10, '8dfd2dbf199f4a18c121532c261de6e7dbc5bd31'),
+    ('dir1/file2.txt', 10, '2ae5b479319444ab14e493acd1c60c46e10a564e'),
 ]
 
+@pytest.fixture(scope='session')
+def mp_context():
+  """forkserver multiprocessing context with the heavyweight modules
+  preloaded once, so each test only pays for a cheap fork off the
+  server instead of a fresh interpreter + imports"""
 
-@pytest.fixture
-def testfs(request, tmpdir):
-  """Does the multiprocessing handling so that the filesystem
-  can be mounted and tested against simultaneously"""
+  ctx = multiprocessing.get_context('forkserver')
+  ctx.set_forkserver_preload(['llfuse', 'fuse_tar', 'logging'])
+  return ctx
 
-  tar_filename = items[request.param][0]
-  directory_path = str(pathlib.Path(__file__).parent.absolute())
-  tar_fullpath = f"{directory_path}/{tar_filename}"
-  tmp_dir = tmpdir
 
-  # We can't use forkserver because we have to make sure
-  # that the server inherits the per-test stdout/stderr file
-  # descriptors.
-  if hasattr(multiprocessing, 'get_context'):
-    mp = multiprocessing.get_context('fork')
-  else:
-    # Older versions only support *fork* anyway
-    mp = multiprocessing
-  if threading.active_count() != 1:
-    raise RuntimeError("Multi-threaded test running is not supported")
+def _dump_fs_log(log_path):
+  """Replay the file system process' log file onto stdout so the output
+  checks in conftest still see it; the forkserver child doesn't inherit
+  the per-test capture file descriptors"""
 
-  mnt_dir = str(tmp_dir)
-  with mp.Manager() as mgr:
-    cross_process = mgr.Namespace()
-    mount_process = mp.Process(target=run_fs,
-                               args=(mnt_dir, cross_process, tar_fullpath))
-
-    mount_process.start()
-    try:
-      wait_for_mount(mount_process, mnt_dir)
-      yield (mnt_dir, cross_process, items[request.param])
-    except:
-      cleanup(mnt_dir)
-      raise
-    else:
-      umount(mount_process, mnt_dir)
+  try:
+    with open(log_path, 'r', encoding='utf-8') as logfh:
+      sys.stdout.write(logfh.read())
+  except OSError:
+    pass
 
 
-@pytest.fixture
-def start_fs(request, tmpdir):
-  """Does the multiprocessing handling so that the filesystem
-  can be mounted and tested against simultaneously"""
+@pytest.fixture(scope='module', params=list(FORMATS), ids=list(FORMATS))
+def mounted_archive(request, tmp_path_factory, mp_context, archives):
+  """Mount each archive variant once per module and serve every member
+  test from the same mount, instead of paying mount + index build +
+  unmount per test"""
 
-  tar_filename = request.param['tar_filename']
-  directory_path = str(pathlib.Path(__file__).parent.absolute())
-  tar_fullpath = f"{directory_path}/{tar_filename}"
-  tmp_dir = tmpdir
+  tar_filename = request.param
+  tar_fullpath = os.path.join(archives, tar_filename)
 
-  # We can't use forkserver because we have to make sure
-  # that the server inherits the per-test stdout/stderr file
-  # descriptors.
-  if hasattr(multiprocessing, 'get_context'):
-    mp = multiprocessing.get_context('fork')
-  else:
-    # Older versions only support *fork* anyway
-    mp = multiprocessing
   if threading.active_count() != 1:
     raise RuntimeError("Multi-threaded test running is not supported")
 
-  mnt_dir = str(tmp_dir)
-  with mp.Manager() as mgr:
-    cross_process = mgr.Namespace()
-    mount_process = mp.Process(target=run_fs,
-                               args=(mnt_dir, cross_process, tar_fullpath))
-
-    mount_process.start()
-    try:
-      wait_for_mount(mount_process, mnt_dir)
-      yield (mnt_dir, cross_process, request.param)
-    except:
-      cleanup(mnt_dir)
-      raise
-    else:
-      umount(mount_process, mnt_dir)
-
-
-@pytest.mark.parametrize(
-    'testfs', [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15],
-    ids=[
-        'tarfile1.tar-513.txt',
-        'tarfile1.tar-10241.txt',
-        'tarfile1.tar-dir1/file1.txt',
-        'tarfile1.tar-dir1/file2.txt',
-        'tarfile1.tar.gz-513.txt',
-        'tarfile1.tar.gz-10241.txt',
-        'tarfile1.tar.gz-dir1/file1.txt',
-        'tarfile1.tar.gz--dir1/file2.txt',
-        'tarfile1.tar.bz2-513.txt',
-        'tarfile1.tar.bz2-10241.txt',
-        'tarfile1.tar.bz2-dir1/file1.txt',
-        'tarfile1.tar.bz2-dir1/file2.txt',
-        'tarfile1.tar-513.txt',
-        'tarfile1.tar-10241.txt',
-        'tarfile1.tar-dir1/file1.txt',
-        'tarfile1.tar-dir1/file2.txt',
-    ],
-    indirect=True)
-def test_correct_read_file_contents(testfs):
+  # mktemp creates the directory, run_fs can rely on it existing
+  mnt_dir = str(tmp_path_factory.mktemp('mnt'))
+  assert os.path.isdir(mnt_dir)
+  # the log file can't live inside mnt_dir, the mount hides it
+  log_path = mnt_dir + '.log'
+  mount_process = mp_context.Process(target=run_fs,
+                                     args=(mnt_dir, tar_fullpath, log_path))
+
+  mount_process.start()
+  try:
+    wait_for_mount(mount_process, mnt_dir)
+    yield mnt_dir
+  except:
+    cleanup(mnt_dir)
+    raise
+  else:
+    umount(mount_process, mnt_dir)
+  finally:
+    _dump_fs_log(log_path)
+
+
+@pytest.fixture(params=['read', 'mmap'])
+def read_mode(request):
+  """Exercise both the plain read() loop and an mmap-backed read; they
+  drive different FUSE request patterns (sequential reads vs
+  page-aligned faults)"""
+
+  return request.param
+
+
+@pytest.mark.parametrize('member', MEMBERS, ids=[m[0] for m in MEMBERS])
+def test_correct_read_file_contents(mounted_archive, member, read_mode):
   """Test that we correctly read the contents of a file"""
 
-  (mnt_dir, _, things) = testfs
-  (_, member_filename, expected_size, expected_sha1) = things
+  (member_filename, expected_size, expected_sha1) = member
 
-  path = os.path.join(mnt_dir, member_filename)
+  path = os.path.join(mounted_archive, member_filename)
 
   observed_size = os.stat(path).st_size
   assert observed_size == expected_size, \
     f"Expected file size to be {expected_size} bytes but is actually {observed_size} bytes for file '{member_filename}'"
 
-  f = open(path, mode='r', encoding='utf-8')
-  data = f.read()
-  f.close()
+  # keep cyclic GC from firing mid-read and, when FUSE_TAR_PIN_CPU=1,
+  # pin to one core so the timings in the hash loop are comparable run
+  # to run (off by default: pinning everything to CPU 0 would serialize
+  # xdist workers)
+  old_affinity = None
+  gc.disable()
+  try:
+    if os.environ.get('FUSE_TAR_PIN_CPU') == '1':
+      old_affinity = os.sched_getaffinity(0)
+      os.sched_setaffinity(0, {0})
+
+    if read_mode == 'mmap':
+      # hash straight out of the mapped pages, no userland copies and no
+      # Python-level chunk loop
+      with open(path, mode='rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+          observed_read_size = len(mm)
+          observed_sha1 = hashlib.sha1(mm).hexdigest()
+    else:
+      # sha1sum drives the read loop through hashlib.file_digest where
+      # available, so no intermediate whole-file buffer and big reads
+      # that amortize the FUSE round-trips
+      with open(path, mode='rb') as f:
+        observed_read_size = os.fstat(f.fileno()).st_size
+        observed_sha1 = sha1sum(f)
+  finally:
+    gc.enable()
+    if old_affinity is not None:
+      os.sched_setaffinity(0, old_affinity)
 
-  observed_read_size = len(data)
   assert observed_read_size == expected_size, \
     f"Expected file size when reading contents to be {expected_size} bytes but is actually {observed_read_size} bytes for file '{member_filename}'"
 
-  observed_sha1 = sha1sum(data.encode('ascii'))
   assert observed_sha1 == expected_sha1, \
     f"Expected file to has sha1 of {expected_sha1} but is actually {observed_sha1} for file '{member_filename}'"
 
 
-@pytest.mark.parametrize('start_fs', [{
-    'tar_filename': 'tarfile1.tar',
-}],
-                         ids=['tarfile1.tar'],
-                         indirect=True)
-def test_root_inode_attributes(start_fs):
+def test_root_inode_attributes(mounted_archive):
   """Test that the root inode attributes are properly set"""
 
-  (mnt_dir, _, params) = start_fs
-  root_stat = os.stat(mnt_dir)
+  root_stat = os.stat(mounted_archive)
 
   assert root_stat.st_mode == (stat.S_IFDIR | 0o755), \
     f"Root inode has wrong st_mode {root_stat.st_mode}"
@@ -209,37 +177,40 @@ def test_root_inode_attributes(start_fs):
     f"Expected root inode number to be {llfuse.ROOT_INODE} but is {root_stat.st_ino}"
 
 
-class Fs(TarFS):
-  """Wrapper around TarFS so we can capture the multiprocessing process"""
-  def __init__(self, tarname: str, cross_process):
-    super(Fs, self).__init__(tarname)
-    self.status = cross_process
-    self.status.lookup_called = False
-    # self.status.root_inode
-
-
-def run_fs(mountpoint: str, cross_process, path_to_tar: str):
+def run_fs(mountpoint: str, path_to_tar: str, log_path=None):
   """Run the Filesystem"""
-  # Logging (note that we run in a new process, so we can't
-  # rely on direct log capture and instead print to stdout)
-
-  os.makedirs(mountpoint, exist_ok=True)
+  # Logging (note that we run in a new process spawned off the
+  # forkserver, so we don't inherit the per-test capture fds; we log to
+  # a file that the fixture replays onto stdout after unmounting)
+
+  # FUSE debug mode and DEBUG-level logging print every upcall, which
+  # serializes read-heavy tests on stdio writes; only pay for that when
+  # explicitly asked for
+  debug = os.environ.get('FUSE_TAR_DEBUG') == '1'
+  log_level = logging.DEBUG if debug else logging.WARNING
   root_logger = logging.getLogger()
   formatter = logging.Formatter(
       '%(asctime)s.%(msecs)03d %(levelname)s '
       '%(funcName)s(%(threadName)s): %(message)s',
       datefmt="%M:%S")
-  handler = logging.StreamHandler(sys.stdout)
-  handler.setLevel(logging.DEBUG)
+  if log_path:
+    handler = logging.FileHandler(log_path)
+  else:
+    handler = logging.StreamHandler(sys.stdout)
+  handler.setLevel(log_level)
   handler.setFormatter(formatter)
-  root_logger.addHandler(handler)
-  root_logger.setLevel(logging.DEBUG)
+  # the forkserver may hand us a process that already ran logging setup;
+  # don't stack a second handler and emit everything twice
+  if not root_logger.handlers:
+    root_logger.addHandler(handler)
+  root_logger.setLevel(log_level)
 
-  tarfs = Fs(path_to_tar, cross_process)
+  tarfs = TarFS(path_to_tar)
   fuse_options = set(llfuse.default_options)
   fuse_options.add('fsname=fuse_tar')
   fuse_options.add('ro')
-  fuse_options.add('debug')
+  if debug:
+    fuse_options.add('debug')
   fuse_options.remove('nonempty')
   llfuse.init(tarfs, mountpoint, fuse_options)
   try:
@@ -4,16 +4,12 @@
 
 import pytest
 
+from fuse_tar import _MODES
 
-@pytest.mark.parametrize("filename,expected_mode", [
-    ('tarfile1.tar', 'r'),
-    ('tarfile1.tar.gz', 'r:gz'),
-    ('tarfile1.tar.bz2', 'r:bz2'),
-    ('tarfile1.tar.xz', 'r:xz'),
-    ('tarfile1.tgz', 'r:gz'),
-    ('tarfile1.tbz2', 'r:bz2'),
-    ('tarfile1.txz', 'r:xz'),
-])
+
+@pytest.mark.parametrize("filename,expected_mode",
+                         [(f'tarfile1{ext}', mode)
+                          for (ext, mode) in _MODES.items()])
 def test_mode_for_filename(filename, expected_mode):
   """Test that we get the proper mode depending upon filename"""
 